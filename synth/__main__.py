@@ -9,7 +9,7 @@ from typing import TypeVar, Generic, Literal, Any
 
 from synth.constraints import DoesNotEvaluateTo, DistinctChildren, Dynamic
 from synth.enumerative import Grammar, EquivalenceScreen
-from synth.eval import ASTEvaluator
+from synth.eval import ASTEvaluator, stack_binds
 from synth.grammar import ProductionRule
 from synth.symbols import Nonterminal
 
@@ -32,6 +32,19 @@ class Guesser(Generic[Feedback, Input], ABC):
     def generate_guess(self) -> ast.Node | ast.Value:
         raise NotImplementedError()
 
+    def generate_guesses(self, n: int, deadline: float = math.inf) -> list[ast.Node | ast.Value]:
+        """
+        Generate up to `n` guesses at once. Fewer are returned if the guesser is exhausted, or once `time.time()`
+        passes `deadline`.
+        """
+        guesses = []
+        try:
+            while len(guesses) < n and time.time() < deadline:
+                guesses.append(self.generate_guess())
+        except StopIteration:
+            pass
+        return guesses
+
     @abstractmethod
     def feedback(self, guess: ast.Node | ast.Value, feedback: Feedback):
         raise NotImplementedError()
@@ -45,24 +58,30 @@ class Oracle(Generic[Feedback, Input], ABC):
     def evaluate(self, guess: ast.Node | ast.Value) -> Literal[True] | Feedback:
         raise NotImplementedError()
 
+    def evaluate_batch(self, guesses: list[ast.Node | ast.Value]) -> list[Literal[True] | Feedback]:
+        return [self.evaluate(guess) for guess in guesses]
+
 
 class InOutExampleOracle(Oracle[bool, list[tuple[dict[str, Any], Any]]]):
     def __init__(self, inp: list[tuple[Any, Any]], ctx: SynthesisContext):
         super().__init__(inp, ctx)
         self.examples = inp
+        self.binds = stack_binds([inputs for inputs, _ in inp])
+        self.expected = tuple(output for _, output in inp)
 
     def evaluate(self, guess: ast.Node | ast.Value) -> bool:
-        for inputs, output in self.examples:
-            if self.ctx.evaluator.eval(guess, inputs) != output:
-                return False
-        return True
+        return self.ctx.evaluator.eval_batch(guess, self.binds, len(self.examples)) == self.expected
+
+    def evaluate_batch(self, guesses: list[ast.Node | ast.Value]) -> list[bool]:
+        eval_batch, binds, lanes, expected = self.ctx.evaluator.eval_batch, self.binds, len(self.examples), self.expected
+        return [eval_batch(guess, binds, lanes) == expected for guess in guesses]
 
 
 class EnumerativeGuesser(Guesser[bool, Any]):
     def __init__(self, inp: Any, ctx: SynthesisContext):
         super().__init__(inp, ctx)
 
-        self.enum = ctx.grammar.enumerate_forever(EquivalenceScreen())
+        self.enum = ctx.grammar.enumerate_forever(EquivalenceScreen(inp, ctx.evaluator))
 
     def generate_guess(self) -> ast.Node | ast.Value:
         return next(self.enum)
@@ -77,6 +96,10 @@ class Synthesis(Generic[Feedback, Input]):
     oracle: Oracle[Feedback, Input]
 
     timeout: float
+    batch_size: int = 64
+    """
+    How many guesses are generated and evaluated at once. Batches are cut short when the timeout is reached.
+    """
 
     def run(self) -> ast.Node | ast.Value | None:
         print("running synthesis on grammar:")
@@ -85,21 +108,23 @@ class Synthesis(Generic[Feedback, Input]):
         for inp, out in self.oracle.examples:
             print(f"  {inp} -> {out}")
 
-        start = time.time()
+        deadline = time.time() + self.timeout
         # until timeout:
-        while start + self.timeout > time.time():
-            # generate guess
-            guess = self.guesser.generate_guess()
+        while deadline > time.time():
+            # generate guesses
+            guesses = self.guesser.generate_guesses(self.batch_size, deadline)
+            if not guesses:
+                return None
             # evaluate
-            res = self.oracle.evaluate(guess)
-            # if it works:
-            if res is True:
-                # return success
-                print(f"correct guess: {guess}")
-            else:
-                #print(f"wrong guess: {guess}")
-                # provide feedback
-                self.guesser.feedback(guess, res)
+            for guess, res in zip(guesses, self.oracle.evaluate_batch(guesses)):
+                # if it works:
+                if res is True:
+                    # return success
+                    print(f"correct guess: {guess}")
+                else:
+                    #print(f"wrong guess: {guess}")
+                    # provide feedback
+                    self.guesser.feedback(guess, res)
 
 
 eval = ASTEvaluator(
@@ -123,24 +148,25 @@ vars = ('x', 'y')
 
 A = Nonterminal("A")
 val = Nonterminal("val")
-G = Grammar(A)
+G = Grammar(A, eval)
 
 nonzero = DoesNotEvaluateTo(0, eval, {})
 notone = DoesNotEvaluateTo(1, eval, {})
+distinct = DistinctChildren()
 
 # add vars
 for var in vars:
-    G += ProductionRule(val, ast.Var(var))
+    G += ProductionRule(val, ast.Var.intern(var))
 
 # add integers
 for int_val in (0,1,-1):
-    G += ProductionRule(val, ast.Int(int_val))
+    G += ProductionRule(val, ast.Int.intern(int_val))
 
 # add functions
 G += ProductionRule(A, val)
-G += ProductionRule(A, ast.SymmetricNode('add', (A + nonzero, A + nonzero)), (DistinctChildren(), Dynamic()))
+G += ProductionRule(A, ast.SymmetricNode('add', (A + nonzero, A + nonzero)), (distinct, Dynamic()))
 G += ProductionRule(A, ast.SymmetricNode('mul', (A + notone + nonzero, A + notone + nonzero)), (Dynamic(),))
-G += ProductionRule(A, ast.Node('sub', (A, A + nonzero)), (DistinctChildren(), Dynamic()))
+G += ProductionRule(A, ast.Node('sub', (A, A + nonzero)), (distinct, Dynamic()))
 G += ProductionRule(A, ast.Node('ite', (A, A, A)), (Dynamic(),))
 
 ctx = SynthesisContext(
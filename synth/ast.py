@@ -1,17 +1,69 @@
 from __future__ import annotations
 from abc import ABC
-from dataclasses import dataclass
-from typing import Sequence
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Sequence
+from weakref import WeakValueDictionary
 
 from synth.ordered import Ordered
 from synth.symbols import Nonterminal
 
 
-@dataclass(frozen=True, slots=True, unsafe_hash=True)
+_INTERN: WeakValueDictionary = WeakValueDictionary()
+"""
+Pool of all live interned AST nodes and values, keyed by their class and structure.
+"""
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
 class Node(Ordered):
     name: str
     children: tuple[Node | Value | Nonterminal, ...]
 
+    _hash: int | None = field(default=None, init=False, repr=False, compare=False)
+    # (evaluator, closure) as produced by ASTEvaluator.compile
+    _compiled: tuple[Any, Callable[[dict[str, Any]], Any]] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _free_vars: frozenset[str] | None = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def intern(cls, name: str, children: tuple[Node | Value | Nonterminal, ...]) -> Node:
+        """
+        Returns the canonical instance of `cls(name, children)`, only constructing a new one if no structurally
+        equal node is alive.
+
+        Children are expected to be interned already, so the lookup only has to compare them by identity.
+        """
+        key = cls._intern_key(name, children)
+        node = _INTERN.get(key)
+        if node is None:
+            node = _INTERN[key] = cls(name, children)
+        return node
+
+    @classmethod
+    def _intern_key(cls, name: str, children: tuple[Node | Value | Nonterminal, ...]):
+        return cls, name, children
+
+    def __reduce__(self):
+        # go through `intern`, so that unpickled nodes are interned again, and the cached closures are not pickled
+        return type(self).intern, (self.name, self.children)
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((self.name, self.children)))
+        return self._hash
+
+    @property
+    def free_vars(self) -> frozenset[str]:
+        """
+        Names of all variables referenced in this AST.
+        """
+        if self._free_vars is None:
+            object.__setattr__(self, '_free_vars', frozenset().union(
+                *(c.free_vars for c in self.children if not isinstance(c, Nonterminal))
+            ))
+        return self._free_vars
+
     @property
     def holes_indices(self) -> tuple[int, ...]:
         """
@@ -39,44 +91,56 @@ class Node(Ordered):
         `replacements` is a list of ASTNodes or Holes by which the children identified by `ids` are replaced.
 
         The child identified by the i-th index in `ids`, is replaced with the i-th element in replacements.
+
+        Returns the node itself if nothing would change.
         """
         assert len(ids) == len(replacements)
-        repl = iter(replacements)
-        id_set = set(ids)
-    
-        return Node(
-            self.name,
-            tuple(c if i not in id_set else next(repl) for i, c in enumerate(self.children))
-        )
+        if all(self.children[i] is repl for i, repl in zip(ids, replacements)):
+            return self
+        children = list(self.children)
+        for i, repl in zip(ids, replacements):
+            children[i] = repl
+        return Node.intern(self.name, tuple(children))
 
     def __str__(self) -> str:
         return self.to_string()
 
     def to_string(self) -> str:
-        kids = []
         for c in self.children:
-            match c:
-                case Node() as node:
-                    kids.append(str(node))
-                case Value() as val:
-                    kids.append(str(val))
-                case Nonterminal() as sym:
-                    kids.append(str(sym))
-                case v:
-                    raise ValueError("Unknown value in children", v)
-        
-        return f"{self.name}({', '.join(kids)})"
+            if not isinstance(c, (Node, Value, Nonterminal)):
+                raise ValueError("Unknown value in children", c)
+        return f"{self.name}({', '.join(map(str, self.children))})"
 
     def key(self):
-        return tuple((self.name, *(x.key() for x in self.children)))
+        # children are Ordered themselves, so comparing keys only recurses into them as far as needed
+        return self.name, self.children
 
 
-@dataclass(frozen=True, slots=True, eq=True, unsafe_hash=True)
+@dataclass(frozen=True, slots=True, eq=True, weakref_slot=True)
 class Value(Ordered, ABC):
-    pass
+    @classmethod
+    def intern(cls, *args) -> Value:
+        """
+        Returns the canonical instance of `cls(*args)`, see `Node.intern`.
+        """
+        key = (cls, *args)
+        val = _INTERN.get(key)
+        if val is None:
+            val = _INTERN[key] = cls(*args)
+        return val
+
+    def __reduce__(self):
+        return type(self).intern, tuple(getattr(self, f.name) for f in fields(self))
+
+    @property
+    def free_vars(self) -> frozenset[str]:
+        """
+        Names of all variables referenced in this value.
+        """
+        return frozenset()
 
 
-@dataclass(frozen=True, slots=True, eq=True, unsafe_hash=True)
+@dataclass(frozen=True, slots=True, eq=True)
 class Int(Value):
     val: int
 
@@ -87,7 +151,7 @@ class Int(Value):
         return str(self.val),
 
 
-@dataclass(frozen=True, slots=True, eq=True, unsafe_hash=True)
+@dataclass(frozen=True, slots=True, eq=True)
 class String(Value):
     val: str
 
@@ -98,10 +162,14 @@ class String(Value):
         return self.val,
 
 
-@dataclass(frozen=True, slots=True, eq=True, unsafe_hash=True)
+@dataclass(frozen=True, slots=True, eq=True)
 class Var(Value):
     name: str
 
+    @property
+    def free_vars(self) -> frozenset[str]:
+        return frozenset((self.name,))
+
     def __str__(self):
         return self.name
 
@@ -111,28 +179,33 @@ class Var(Value):
 
 @dataclass(frozen=True, slots=True)
 class SymmetricNode(Node):
-    def __eq__(self, other):
-        if isinstance(other, SymmetricNode) and set(other.children) == set(self.children):
-            return True
-        return Node.__eq__(self, other)
+    """
+    A node whose children can be reordered freely.
+
+    Children of nodes without holes are sorted on construction, so that nodes only differing in the order of their
+    children are equal.
+    """
+    def __post_init__(self):
+        if not self.holes:
+            object.__setattr__(self, 'children', tuple(sorted(self.children)))
+
+    @classmethod
+    def _intern_key(cls, name: str, children: tuple[Node | Value | Nonterminal, ...]):
+        if any(isinstance(c, Nonterminal) for c in children):
+            return cls, name, children
+        # argument order does not matter, so add(x, y) and add(y, x) share one instance
+        return cls, name, tuple(sorted(children))
 
     def replace_children(self, ids: Sequence[int], replacements: Sequence[Node | Value | Nonterminal]) -> Node:
         match tuple(replacements):
             case (lhs, rhs):
-                return SymmetricNode(self.name, (lhs, rhs))
+                return SymmetricNode.intern(self.name, (lhs, rhs))
             case (a,):
-                SymmetricNode(
+                return SymmetricNode.intern(
                     self.name,
                     (a, self.children[1]) if ids[0] == 0 else (self.children[0], a),
                 )
             case ():
                 return self
 
-    def __hash__(self):
-        if self.holes:
-            return super().__hash__()
-        return hash((self.name, *sorted(self.children)))
-
-    def __lt__(self, other):
-        if isinstance(other, Node):
-            return (self.name, *self.children) < (other.name, *other.children)
+    __hash__ = Node.__hash__
@@ -0,0 +1,76 @@
+"""
+Candidate programs in a struct of arrays layout, for evaluating many programs at once.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from synth import ast
+from synth.eval import ASTEvaluator, Failure, VAR, CONST
+
+
+@dataclass(slots=True)
+class SoABatch:
+    """
+    A batch of programs, flattened into a table with one row per distinct (sub-)program.
+
+    Rows are in postorder, so the arguments of a row always come before it. Subtrees shared between programs only
+    get a single row, so they are evaluated only once for the whole batch.
+    """
+    evaluator: ASTEvaluator
+    opcodes: list[int] = field(default_factory=list)
+    """
+    `VAR`, `CONST`, or an index into the operator table of the evaluator.
+    """
+    payloads: list[Any] = field(default_factory=list)
+    """
+    The variable name, the constant, or the node passed to the operator, see `eval.Bytecode`.
+    """
+    args: list[tuple[int, ...]] = field(default_factory=list)
+    """
+    The rows holding the children of each row.
+    """
+    roots: list[int] = field(default_factory=list)
+    """
+    The row of each program in the batch.
+    """
+
+    def __len__(self):
+        return len(self.roots)
+
+
+def candidates_to_soa(nodes: Iterable[ast.Node | ast.Value], evaluator: ASTEvaluator) -> SoABatch:
+    """
+    Flatten `nodes` into a `SoABatch` for `evaluator`.
+    """
+    batch = SoABatch(evaluator)
+    rows: dict[ast.Node | ast.Value, int] = {}
+
+    def add(node: ast.Node | ast.Value) -> int:
+        row = rows.get(node)
+        if row is not None:
+            return row
+        match node:
+            case ast.Var(name):
+                opcode, payload, args = VAR, name, ()
+            case ast.Int(val) | ast.String(val):
+                opcode, payload, args = CONST, val, ()
+            case ast.Value():
+                opcode, payload, args = CONST, node, ()
+            case ast.Node(name, children) if name in evaluator._opcodes:
+                opcode, payload, args = evaluator._opcodes[name], node, tuple(map(add, children))
+            case ast.Node(name):
+                # unknown operators fail like they do in `ASTEvaluator.eval`, but only for the programs using them
+                opcode, payload, args = CONST, Failure(KeyError(name)), ()
+            case _:
+                raise ValueError(f"Can't evaluate {node}")
+        row = rows[node] = len(batch.opcodes)
+        batch.opcodes.append(opcode)
+        batch.payloads.append(payload)
+        batch.args.append(args)
+        return row
+
+    batch.roots.extend(map(add, nodes))
+    return batch
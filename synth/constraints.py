@@ -2,14 +2,34 @@ from __future__ import annotations
 
 import itertools
 from abc import abstractmethod
-from dataclasses import dataclass
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
 from typing import Any
+from weakref import WeakKeyDictionary
 
 from synth import ast as ast
-from synth.eval import ASTEvaluator
+from synth.batch import candidates_to_soa
+from synth.eval import ASTEvaluator, Failure
+from synth.symbols import Nonterminal
 
 
-@dataclass(unsafe_hash=True, frozen=True)
+def all_valid(constraints: Sequence[GenerationConstraint], node: ast.Node | ast.Value) -> bool:
+    """
+    Check `node` against all `constraints`.
+
+    Rules mostly have no or a single constraint, which skip setting up the loop.
+    """
+    if not constraints:
+        return True
+    if len(constraints) == 1:
+        return constraints[0].is_valid_entry(node)
+    for c in constraints:
+        if not c.is_valid_entry(node):
+            return False
+    return True
+
+
+@dataclass(unsafe_hash=True, frozen=True, slots=True)
 class GenerationConstraint:
     @abstractmethod
     def is_valid_entry(self, node: ast.Node | ast.Value):
@@ -18,59 +38,134 @@ class GenerationConstraint:
         """
         raise NotImplementedError()
 
+    def fills(
+        self, template: ast.Node, candidates: Sequence[Sequence[ast.Node | ast.Value]]
+    ) -> Iterable[tuple[ast.Node | ast.Value, ...]]:
+        """
+        All ways to fill the holes of `template` with one of the `candidates` for each hole.
+
+        Constraints that can be decided on the children alone override this to skip fills violating them, so that
+        their nodes are never built. Nodes built from the fills of such constraints don't need to be checked again.
+        """
+        return itertools.product(*candidates)
+
+    def is_valid_batch(self, nodes: Sequence[ast.Node | ast.Value]) -> list[bool]:
+        """
+        `is_valid_entry` for each of the `nodes`. Constraints can override this to check many nodes at once.
+        """
+        return [self.is_valid_entry(node) for node in nodes]
 
-@dataclass(unsafe_hash=True, frozen=True)
+
+@dataclass(unsafe_hash=True, frozen=True, slots=True)
 class DoesNotEvaluateTo(GenerationConstraint):
     """
     Checks that a program does not evaluate to a constant
     """
     val: Any
-    eval: ASTEvaluator
-    binds: dict[str, Any]
+    # neither evaluator nor bindings are hashable
+    eval: ASTEvaluator = field(hash=False)
+    binds: dict[str, Any] = field(hash=False)
+
+    _required_vars: frozenset[str] = field(init=False, repr=False, compare=False)
+    _cache: WeakKeyDictionary[ast.Node | ast.Value, bool] = field(
+        default_factory=WeakKeyDictionary, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        object.__setattr__(self, '_required_vars', frozenset(self.binds))
 
     def is_valid_entry(self, node: ast.Node | ast.Value):
-        try:
-            return self.eval.eval(node, self.binds) != self.val
-        except KeyError:
+        # programs referring to unbound variables can't be evaluated, so we can't rule them out
+        if not node.free_vars <= self._required_vars:
             return True
+        res = self._cache.get(node)
+        if res is None:
+            try:
+                res = self.eval.eval(node, self.binds) != self.val
+            except KeyError:
+                res = True
+            self._cache[node] = res
+        return res
+
+    def is_valid_batch(self, nodes: Sequence[ast.Node | ast.Value]) -> list[bool]:
+        # evaluate all uncached nodes in one pass, so subtrees shared between them are only evaluated once
+        res = []
+        todo = []
+        for i, node in enumerate(nodes):
+            if not node.free_vars <= self._required_vars:
+                res.append(True)
+                continue
+            cached = self._cache.get(node)
+            if cached is None:
+                todo.append(i)
+            res.append(cached)
+        if todo:
+            batch = candidates_to_soa((nodes[i] for i in todo), self.eval)
+            for i, val in zip(todo, self.eval.eval_soa(batch, self.binds)):
+                if type(val) is Failure:
+                    if not isinstance(val.error, KeyError):
+                        raise val.error
+                    valid = True
+                else:
+                    valid = val != self.val
+                res[i] = self._cache[nodes[i]] = valid
+        return res
 
     def __str__(self):
         return f"≠{self.val}"
 
 
-@dataclass(unsafe_hash=True, frozen=True)
+@dataclass(unsafe_hash=True, frozen=True, slots=True)
 class DistinctChildren(GenerationConstraint):
     """
     Make sure children are pairwise distinct.
 
     Returns True for ASTValue.
     """
+
     def is_valid_entry(self, node: ast.Node | ast.Value):
         if isinstance(node, ast.Value):
             return True
 
-        for a, b in itertools.permutations(node.children, r=2):
-            if a == b:
-                return False
-        return True
+        return len(set(node.children)) == len(node.children)
 
     def __str__(self):
         return f"distinct"
 
 
-@dataclass(unsafe_hash=True, frozen=True)
+@dataclass(unsafe_hash=True, frozen=True, slots=True)
 class Dynamic(GenerationConstraint):
     """
     Checks that at least one of the children refers to an ast.Var.
     """
+    _cache: WeakKeyDictionary[ast.Node | ast.Value, bool] = field(
+        default_factory=WeakKeyDictionary, init=False, repr=False, compare=False
+    )
+
     def is_valid_entry(self, node: ast.Node | ast.Value):
-        match node:
-            case ast.Var():
-                return True
-            case ast.Node(children=children):
-                return any(self.is_valid_entry(child) for child in children)
-            case _:
-                return False
+        res = self._cache.get(node)
+        if res is None:
+            match node:
+                case ast.Var():
+                    res = True
+                case ast.Node(children=children):
+                    res = any(self.is_valid_entry(child) for child in children)
+                case _:
+                    res = False
+            self._cache[node] = res
+        return res
+
+    def fills(
+        self, template: ast.Node, candidates: Sequence[Sequence[ast.Node | ast.Value]]
+    ) -> Iterable[tuple[ast.Node | ast.Value, ...]]:
+        if any(self.is_valid_entry(c) for c in template.children if not isinstance(c, Nonterminal)):
+            yield from itertools.product(*candidates)
+            return
+        # partition by the first dynamic child: all holes before it must be filled with static children
+        static = [[c for c in cands if not self.is_valid_entry(c)] for cands in candidates]
+        for i, cands in enumerate(candidates):
+            dynamic = [c for c in cands if self.is_valid_entry(c)]
+            yield from itertools.product(*static[:i], dynamic, *candidates[i + 1:])
 
     def __str__(self):
         return "dyn"
@@ -1,34 +1,153 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
 from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+import functools
 import itertools
+import math
+import multiprocessing
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from weakref import WeakKeyDictionary
 
 
-from synth.constraints import DoesNotEvaluateTo, DistinctChildren
+from synth.constraints import DoesNotEvaluateTo, DistinctChildren, GenerationConstraint, all_valid
 from synth import ast
 from synth.ast import Node, Value, SymmetricNode
 from synth.grammar import ProductionRule
-from synth.eval import ASTEvaluator
+from synth.eval import ASTEvaluator, stack_binds
 from synth.symbols import Nonterminal
 
 
+VALUE = 0
+ALIAS = 1
+NODE = 2
+
+
+class ExpansionSpec(NamedTuple):
+    """
+    A production rule, lowered into what the enumerators need to expand it.
+    """
+    kind: int
+    """
+    What the rule produces, one of `VALUE`, `ALIAS` (another nonterminal) or `NODE` (an AST node with holes).
+    """
+    rule: ProductionRule
+    template: Node | Value | Nonterminal
+    hole_ids: tuple[int, ...] = ()
+    holes: tuple[Nonterminal, ...] = ()
+    filler: GenerationConstraint | None = None
+    """
+    The rule constraint used to enumerate fills of the holes, see `GenerationConstraint.fills`.
+    """
+    constraints: tuple[GenerationConstraint, ...] = ()
+    """
+    The remaining rule constraints, which must be checked on every produced node.
+    """
+    build: Callable[..., Node] | None = None
+    """
+    Constructs the node for one fill of the holes, see `_compile_builder`.
+    """
+
+    @staticmethod
+    def lower(rule: ProductionRule) -> ExpansionSpec:
+        match rule.rhs:
+            case Nonterminal() as sym:
+                return ExpansionSpec(ALIAS, rule, sym, constraints=rule.constraints)
+            case Node() as node:
+                # pick the first constraint that can prune fills, if any
+                filler = next((c for c in rule.constraints if type(c).fills is not GenerationConstraint.fills), None)
+                return ExpansionSpec(
+                    NODE, rule, node, node.holes_indices, node.holes,
+                    filler, tuple(c for c in rule.constraints if c is not filler),
+                    _compile_builder(node),
+                )
+            case Value() as val:
+                return ExpansionSpec(VALUE, rule, val, constraints=rule.constraints)
+            case _:
+                raise ValueError(f"Unknown hole", rule)
+
+    def fills(self, candidates: list[list[Node | Value]]) -> Iterable[tuple[Node | Value, ...]]:
+        if self.filler is None:
+            return itertools.product(*candidates)
+        return self.filler.fills(self.template, candidates)
+
+    def accepts(self, node: Node | Value) -> bool:
+        return all_valid(self.constraints, node)
+
+
 @dataclass(unsafe_hash=True, eq=True, slots=True)
 class Grammar:
     start: Nonterminal
-    _maps: dict[str, list[ProductionRule]] = field(default_factory=lambda: defaultdict(list), init=False)
+    evaluator: ASTEvaluator | None = field(default=None, compare=False)
+    """
+    If given, generated nodes without variables are constant-folded using this evaluator.
+    """
+    _rules: list[ProductionRule] = field(default_factory=list, init=False)
+    # whether rules were added since the last `finalize`
+    _dirty: bool = field(default=False, init=False, compare=False)
+    # all dicts indexed by nonterminals are keyed on the unconstrained `Nonterminal.base`
+    _by_lhs: dict[Nonterminal, tuple[ProductionRule, ...]] = field(default_factory=dict, init=False, compare=False)
+    _specs: dict[Nonterminal, tuple[ExpansionSpec, ...]] = field(default_factory=dict, init=False, compare=False)
+    _subst_cache: dict[tuple[Nonterminal | int, int], tuple[ExpansionSpec | Nonterminal, list[Node | Value]]] = field(
+        default_factory=dict, init=False, compare=False
+    )
+    # the smallest depth at which each nonterminal produces anything, infinite if it never does
+    _min_depth: dict[Nonterminal, float] = field(default_factory=dict, init=False, compare=False)
+    # nonterminals that only produce constants, with the constants that pass all rule and nonterminal constraints.
+    # constrained nonterminals are interned, so they key their own pruned entry.
+    _atomic_expansions: dict[Nonterminal, list[Value]] = field(default_factory=dict, init=False, compare=False)
+    # constant nodes and what they were folded to, None if they can't be folded
+    _folded: WeakKeyDictionary[Node, Value | None] = field(
+        default_factory=WeakKeyDictionary, init=False, compare=False
+    )
+    # all programs of a nonterminal, indexed by their size. Constrained nonterminals hold the accepted programs.
+    _by_size: dict[Nonterminal, list[list[Node | Value]]] = field(
+        default_factory=lambda: defaultdict(list), init=False, compare=False
+    )
 
     def __iadd__(self, other: ProductionRule):
-        self._maps[other.lhs.name].append(other)
+        self._rules.append(other)
+        self._dirty = True
         return self
 
+    def finalize(self):
+        """
+        Index the rules and precompute everything that does not change during enumeration.
+
+        This is done automatically before enumerating after rules were added.
+        """
+        by_lhs = defaultdict(list)
+        for rule in self._rules:
+            by_lhs[rule.lhs.base].append(rule)
+        self._by_lhs = {sym: tuple(rules) for sym, rules in by_lhs.items()}
+        self._specs = {sym: _prune_constants(map(ExpansionSpec.lower, rules)) for sym, rules in self._by_lhs.items()}
+        # nonterminals that only produce values are expanded up front
+        self._atomic_expansions = {
+            sym: [spec.template for spec in specs]
+            for sym, specs in self._specs.items()
+            if all(spec.kind == VALUE for spec in specs)
+        }
+        # and so are all constrained versions of them that are used in the grammar
+        for spec in itertools.chain.from_iterable(self._specs.values()):
+            for sym in (*spec.holes, spec.template, self.start):
+                if isinstance(sym, Nonterminal) and sym.constraints and sym.base in self._atomic_expansions:
+                    self._atomic_expansions[sym] = [c for c in self._atomic_expansions[sym.base] if sym.accepts(c)]
+        self._min_depth = _min_depths(self._specs)
+        self._subst_cache.clear()
+        self._by_size.clear()
+        self._dirty = False
+
     def __str__(self):
+        if self._dirty:
+            self.finalize()
         res = ['Grammar:']
-        longest_name = max(len(sym) for sym in self._maps)
+        longest_name = max(len(sym.name) for sym in self._by_lhs)
         space = ' ' * longest_name
         # collapse rules without constraints together
-        for sym, rules in self._maps.items():
+        for sym, rules in self._by_lhs.items():
+            sym = sym.name
             if all(not rule.constraints for rule in rules):
                 res.append(f"{sym:<{longest_name}} ::= {' | '.join(str(x.rhs) for x in rules)}")
             else:
@@ -40,65 +159,347 @@ class Grammar:
 
         return "\n\t".join(res)
 
-    def enumerate_bottom_up(self, depth: int, screen: EnumerationFilter) -> Iterable[Node | Value]:
-        for prod in self._maps[self.start.name]:
+    def enumerate_bottom_up(self, depth: int, screen: EnumerationFilter, since: int = 0) -> Iterable[Node | Value]:
+        """
+        Enumerate all useful programs up to the given depth.
+
+        Programs that can already be produced at depth `since` are skipped.
+        """
+        if self._dirty:
+            self.finalize()
+        for prod in self._by_lhs.get(self.start.base, ()):
+            known = set(self.perform_substitution(prod, depth=since))
             for ast in self.perform_substitution(prod, depth=depth):
-                if screen.is_useful_program(ast):
+                if ast not in known and screen.is_useful_program(ast):
                     yield ast
                     screen.register_program(ast)
 
     def enumerate_forever(self, screen: EnumerationFilter):
-        for depth in range(0, 10000):
-            yield from self.enumerate_bottom_up(depth, screen)
+        yield from self.enumerate_by_size(screen)
+
+    def enumerate_by_size(self, screen: EnumerationFilter) -> Iterable[Node | Value]:
+        """
+        Enumerate all useful programs in order of ascending size (number of AST nodes).
+
+        Programs of each size are built once from the stored smaller programs, and never recomputed. Programs are
+        yielded while their size class is still being built, so consumers don't wait for the whole class.
+        """
+        if self._dirty:
+            self.finalize()
+        for size in itertools.count(1):
+            for ast in self._stream_programs_of_size(self.start.base, size):
+                if screen.is_useful_program(ast):
+                    yield ast
+                    screen.register_program(ast)
+
+    def programs_of_size(self, sym: Nonterminal, size: int) -> list[Node | Value]:
+        """
+        All programs of exactly `size` AST nodes that can be produced from the rules of `sym`.
+
+        The constraints of `sym` are not applied.
+        """
+        if self._dirty:
+            self.finalize()
+        sym = sym.base
+        cells = self._by_size[sym]
+        while len(cells) <= size:
+            cells.append(list(self._generate_programs_of_size(sym, len(cells))))
+        return cells[size]
+
+    def _stream_programs_of_size(self, sym: Nonterminal, size: int) -> Iterable[Node | Value]:
+        """
+        Like `programs_of_size`, but yields the programs of a missing size class as they are generated.
+        """
+        cells = self._by_size[sym]
+        if len(cells) > size:
+            yield from cells[size]
+            return
+        # the new class is built from all smaller ones
+        self.programs_of_size(sym, size - 1)
+        cell = []
+        for ast in self._generate_programs_of_size(sym, size):
+            cell.append(ast)
+            yield ast
+        # only store the class once it is complete, and if no one else built it in the meantime
+        if len(cells) == size:
+            cells.append(cell)
+
+    def _generate_programs_of_size(self, sym: Nonterminal, size: int) -> Iterable[Node | Value]:
+        # different derivations can produce the same program, e.g. through constant folding
+        seen = set()
+        for ast in self._derive_programs_of_size(sym, size):
+            if ast not in seen:
+                seen.add(ast)
+                yield ast
+
+    def _derive_programs_of_size(self, sym: Nonterminal, size: int) -> Iterable[Node | Value]:
+        for spec in self._specs.get(sym, ()):
+            rule = spec.rule
+            # another nonterminal => same size, different symbol
+            if spec.kind == ALIAS:
+                yield from filter(rule.can_substitute, self.programs_of_size(spec.template, size))
+            # an ast node => distribute the remaining size over all holes
+            elif spec.kind == NODE:
+                for sizes in _compositions(size - 1, len(spec.holes)):
+                    # apply the constraints of each hole before combining them
+                    candidates = [self._accepted_programs_of_size(hole, k) for hole, k in zip(spec.holes, sizes)]
+                    for fill in spec.fills(candidates):
+                        new_node = spec.build(*fill)
+                        if spec.accepts(new_node):
+                            yield self.fold_constants(new_node)
+            # a terminal => only of size one
+            elif size == 1 and spec.accepts(spec.template):
+                yield spec.template
+
+    def _accepted_programs_of_size(self, sym: Nonterminal, size: int) -> list[Node | Value]:
+        """
+        Like `programs_of_size`, but only the programs that pass the constraints of `sym`.
+        """
+        if not sym.constraints:
+            return self.programs_of_size(sym, size)
+        cells = self._by_size[sym]
+        while len(cells) <= size:
+            k = len(cells)
+            if sym in self._atomic_expansions:
+                cells.append(self._atomic_expansions[sym] if k == 1 else [])
+            else:
+                cells.append(_accepted(sym, self.programs_of_size(sym, k)))
+        return cells[size]
 
     def perform_substitution(self, production: ProductionRule | Nonterminal, depth: int) -> Iterable[Node | Value]:
         """
         Fill all holes in `production` with all possible productions of their production rules.
+
+        Results are cached per production and depth, so deeper enumerations reuse the shallower ones.
+        """
+        if self._dirty:
+            self.finalize()
+        if isinstance(production, ProductionRule):
+            production = ExpansionSpec.lower(production)
+        return iter(self._substitute(production, depth))
+
+    def perform_substitution_parallel(
+        self, production: Nonterminal, depth: int, max_workers: int | None = None
+    ) -> Iterable[Node | Value]:
         """
+        Like `perform_substitution`, but the rules of `production` are expanded in separate processes.
+
+        This is opt-in rather than chosen automatically by `perform_substitution`: sending results back from the
+        workers costs about as much as computing them for typical grammars, so it only pays off with many cores.
+
+        Workers are forked, so that they inherit the grammar and its caches without pickling them. Falls back to the
+        serial version for shallow depths, where the processes cost more than they save, and on platforms that
+        can't fork.
+        """
+        if self._dirty:
+            self.finalize()
+        sym = production.base
+        specs = self._specs.get(sym, ())
+        key = (sym, depth)
+        if (
+            depth <= 2 or len(specs) < 2 or key in self._subst_cache
+            or 'fork' not in multiprocessing.get_all_start_methods()
+        ):
+            return self.perform_substitution(production, depth)
+
+        with ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context('fork'), initializer=_init_worker, initargs=(self,)
+        ) as pool:
+            parts = list(pool.map(
+                _substitute_in_worker, itertools.repeat(sym), range(len(specs)), itertools.repeat(depth)
+            ))
+        # nodes are interned again when they are unpickled, so the results can be cached like serial ones
+        results = list(dict.fromkeys(itertools.chain.from_iterable(parts)))
+        self._subst_cache[key] = (sym, results)
+        return self.perform_substitution(production, depth)
+
+    def _substitute(self, production: ExpansionSpec | Nonterminal, depth: int) -> list[Node | Value]:
+        # productions that need more depth than is left can't produce anything
+        if _min_depth(production, self._min_depth) > depth:
+            return []
+        if isinstance(production, Nonterminal):
+            # equal nonterminals share an entry, even if they were constructed separately
+            key = (production, depth)
+        else:
+            # specs are lowered on the fly for external callers, so key them on the rule they were lowered from
+            key = (id(production.rule), depth)
+        entry = self._subst_cache.get(key)
+        if entry is None:
+            # keep the production alive alongside its results, so that its id is not reused while cached
+            # different derivations can produce the same program, only keep the first one
+            results = list(dict.fromkeys(self._perform_substitution(production, depth)))
+            entry = self._subst_cache[key] = (production, results)
+        return entry[1]
+
+    def _perform_substitution(self, production: ExpansionSpec | Nonterminal, depth: int) -> list[Node | Value]:
         # if we run out of depth, return empty
         if depth <= 0:
-            return
+            return []
 
         # If we're given a nonterminal instead of a rule, iterate over all rues of the nonterminal
         # and check against the nonterminals constraints
         if isinstance(production, Nonterminal):
             sym: Nonterminal = production
-            for rule in self._maps[sym.name]:
-                yield from filter(
-                    sym.accepts,
-                    self.perform_substitution(rule, depth)
-                )
-            return
+            if sym in self._atomic_expansions:
+                return self._atomic_expansions[sym]
+            # constrained nonterminals only filter the (shared) expansion of the unconstrained one
+            if sym.constraints:
+                return _accepted(sym, self._substitute(sym.base, depth))
+            return [c for spec in self._specs.get(sym, ()) for c in self._substitute(spec, depth)]
+
+        rule = production.rule
+        # an ast node => recurse on all holes of the AST node, reducing depth:
+        if production.kind == NODE:
+            res = []
+            candidates = [self._substitute(hole, depth - 1) for hole in production.holes]
+            for fill in production.fills(candidates):
+                new_node = production.build(*fill)
+                # check remaining constraints of production rule
+                if production.accepts(new_node):
+                    res.append(self.fold_constants(new_node))
+            return res
+        # another nontermial => recurse without reducing depth
+        if production.kind == ALIAS:
+            # replace symbol by all things that can be produced from that symbol
+            # apply constraints
+            return [
+                c for spec in self._specs.get(production.template.base, ())
+                for c in self._substitute(spec, depth) if rule.can_substitute(c)
+            ]
+        # a Terminal => return terminal:
+        if production.accepts(production.template):
+            return [production.template]
+        return []
+
+    def fold_constants(self, node: Node) -> Node | Value:
+        """
+        Replace `node` by an `ast.Int` if it does not reference any variables and evaluates to an int.
 
-        # specialise on what the rule produces:
-        match production.rhs:
-            # another nontermial => recurse without reducing depth
-            case Nonterminal() as sym:
-                # replace symbol by all things that can be produced from that symbol
-                # apply constraints
-                yield from filter(
-                    production.can_substitute,
-                    itertools.chain(*(self.perform_substitution(val, depth=depth) for val in self._maps[sym.name]))
-                )
-            # an ast node => recurse on all children of the AST node that are nonterminals, reducing depth:
-            case Node() as node:
-                # find all "holes" in the symbol
-                hole_ids = node.holes_indices
-                holes = node.holes
-                # fill them
-                for fill in itertools.product(*(self.perform_substitution(hole, depth=depth-1) for hole in holes)):
-                    new_node = node.replace_children(hole_ids, fill)
-                    # check constraints of production rule
-                    if production.can_substitute(new_node):
-                        yield new_node
-            # a Terminal => return terminal:
-            case Value() as val:
-                if not production.can_substitute(val):
-                    return
-                yield val
-            # something else => Error:
-            case _:
-                raise ValueError(f"Unknown hole", production)
+        Nodes are returned unchanged if the grammar has no evaluator, or if they can't be evaluated.
+        """
+        if self.evaluator is None or node.free_vars or node.name not in self.evaluator.evals:
+            return node
+        if node in self._folded:
+            return self._folded[node] or node
+        try:
+            res = self.evaluator.eval(node, {})
+        except Exception:
+            # folding is only an optimization, anything that fails to evaluate is kept as is
+            res = None
+        # store None instead of the node itself, which would keep the weak key alive
+        folded = self._folded[node] = ast.Int.intern(res) if type(res) is int else None
+        return folded or node
+
+
+def _compile_builder(node: Node) -> Callable[..., Node]:
+    """
+    Generate a function that takes one argument per hole of `node`, and returns the interned node with its holes
+    replaced by these arguments.
+
+    The shape of the node is fixed when the grammar is built, so the function can construct the children tuple
+    directly instead of going through `Node.replace_children`.
+    """
+    env = {'intern': type(node).intern, 'name': node.name}
+    params, children = [], []
+    for i, c in enumerate(node.children):
+        if isinstance(c, Nonterminal):
+            params.append(f"c{i}")
+            children.append(f"c{i}")
+        else:
+            env[f"k{i}"] = c
+            children.append(f"k{i}")
+    # trailing commas, so that a single child still makes a tuple and no children make an empty one
+    src = f"def build({', '.join(params)}):\n    return intern(name, ({''.join(f'{c}, ' for c in children)}))\n"
+    exec(compile(src, f"<build {node}>", 'exec'), env)
+    return env['build']
+
+
+def _accepted(sym: Nonterminal, programs: list[Node | Value]) -> list[Node | Value]:
+    """
+    The `programs` that pass all constraints of `sym`, checking each constraint on all remaining programs at once.
+    """
+    for c in sym.constraints:
+        if not programs:
+            break
+        programs = list(itertools.compress(programs, c.is_valid_batch(programs)))
+    return programs
+
+
+_worker_grammar: Grammar | None = None
+"""
+The grammar expanded by a worker process of `Grammar.perform_substitution_parallel`, only set in the workers.
+"""
+
+
+def _init_worker(grammar: Grammar):
+    global _worker_grammar
+    _worker_grammar = grammar
+
+
+def _substitute_in_worker(sym: Nonterminal, index: int, depth: int) -> list[Node | Value]:
+    return _worker_grammar._substitute(_worker_grammar._specs[sym][index], depth)
+
+
+def _min_depth(production: ExpansionSpec | Nonterminal, min_depths: dict[Nonterminal, float]) -> float:
+    """
+    The smallest depth at which `production` produces anything, given the smallest depths of all nonterminals.
+    """
+    if isinstance(production, Nonterminal):
+        return min_depths.get(production.base, math.inf)
+    if production.kind == ALIAS:
+        return min_depths.get(production.template.base, math.inf)
+    if production.kind == NODE:
+        return 1 + max((min_depths.get(hole.base, math.inf) for hole in production.holes), default=0)
+    return 1
+
+
+def _min_depths(specs: dict[Nonterminal, tuple[ExpansionSpec, ...]]) -> dict[Nonterminal, float]:
+    """
+    The smallest depth at which each nonterminal produces anything, computed as a fixpoint over all rules.
+    """
+    min_depths = {sym: math.inf for sym in specs}
+    changed = True
+    while changed:
+        changed = False
+        for sym, rules in specs.items():
+            depth = min((_min_depth(spec, min_depths) for spec in rules), default=math.inf)
+            if depth < min_depths[sym]:
+                min_depths[sym] = depth
+                changed = True
+    return min_depths
+
+
+def _prune_constants(specs: Iterable[ExpansionSpec]) -> tuple[ExpansionSpec, ...]:
+    """
+    Drop the rules producing constants their own constraints reject, and clear the constraints of the others.
+
+    The outcome is known when the grammar is built, so it does not have to be checked on every expansion.
+    """
+    res = []
+    for spec in specs:
+        if spec.kind == VALUE:
+            if not spec.accepts(spec.template):
+                continue
+            spec = spec._replace(constraints=())
+        res.append(spec)
+    return tuple(res)
+
+
+@functools.cache
+def _compositions(total: int, parts: int) -> tuple[tuple[int, ...], ...]:
+    """
+    All tuples of `parts` positive integers that sum up to `total`.
+
+    Every rule with the same number of holes needs the same compositions for each size, so they are only computed
+    once.
+    """
+    if parts == 0:
+        return ((),) if total == 0 else ()
+    return tuple(
+        (first, *rest)
+        for first in range(1, total - parts + 2)
+        for rest in _compositions(total - first, parts - 1)
+    )
 
 
 class EnumerationFilter(ABC):
@@ -111,7 +512,10 @@ class EnumerationFilter(ABC):
         pass
 
 
-class EquivalenceScreen(EnumerationFilter):
+class SyntacticScreen(EnumerationFilter):
+    """
+    Filters out programs that are structurally equal to an already generated program.
+    """
     generated_programs: set[Node | Value]
 
     def __init__(self):
@@ -124,6 +528,58 @@ class EquivalenceScreen(EnumerationFilter):
         self.generated_programs.add(ast)
 
 
+EVAL_ERROR = object()
+"""
+Placeholder in a program signature for examples on which the program raised an error.
+"""
+
+
+class EquivalenceScreen(EnumerationFilter):
+    """
+    Filters out programs that are observationally equivalent to an already generated program,
+    meaning they produce the same outputs on all example inputs.
+    """
+    examples: list[tuple[dict[str, Any], Any]]
+    evaluator: ASTEvaluator
+    _binds: dict[str, tuple[Any, ...]]
+    _sigs: set[tuple[Any, ...]]
+    _last: tuple[Node | Value | None, tuple[Any, ...]]
+
+    def __init__(self, examples: list[tuple[dict[str, Any], Any]], evaluator: ASTEvaluator):
+        self.examples = examples
+        self.evaluator = evaluator
+        self._binds = stack_binds([binds for binds, _ in examples])
+        self._sigs = set()
+        self._last = (None, ())
+
+    def signature(self, ast: Node | Value) -> tuple[Any, ...]:
+        """
+        The outputs of `ast` on all example inputs, with `EVAL_ERROR` for inputs it fails to evaluate on.
+        """
+        try:
+            return self.evaluator.eval_batch(ast, self._binds, len(self.examples))
+        except Exception:
+            pass
+        # find out which of the examples failed
+        sig = []
+        for binds, _ in self.examples:
+            try:
+                sig.append(self.evaluator.eval(ast, binds))
+            except Exception:
+                sig.append(EVAL_ERROR)
+        return tuple(sig)
+
+    def is_useful_program(self, ast: Node | Value) -> bool:
+        sig = self.signature(ast)
+        # remember the signature, programs are usually registered right after being checked
+        self._last = (ast, sig)
+        return sig not in self._sigs
+
+    def register_program(self, ast: Node | Value):
+        last, sig = self._last
+        self._sigs.add(sig if last is ast else self.signature(ast))
+
+
 if __name__ == '__main__':
     """
     A   := int | var | `add` A A | `sub` A A
@@ -146,10 +602,10 @@ if __name__ == '__main__':
 
     g = Grammar(A)
 
-    g += ProductionRule(val, ast.Int(0))
-    g += ProductionRule(val, ast.Int(1))
-    g += ProductionRule(val, ast.Var('x'))
-    g += ProductionRule(val, ast.Var('y'))
+    g += ProductionRule(val, ast.Int.intern(0))
+    g += ProductionRule(val, ast.Int.intern(1))
+    g += ProductionRule(val, ast.Var.intern('x'))
+    g += ProductionRule(val, ast.Var.intern('y'))
 
     g += ProductionRule(A, val)
     g += ProductionRule(
@@ -173,7 +629,7 @@ if __name__ == '__main__':
     #C_Notone = DoesNotEvaluateTo(1, evaluator, vars)
 
     print(g)
-    screen = EquivalenceScreen()
+    screen = SyntacticScreen()
 
 
     print("\ndepth = 1")
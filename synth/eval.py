@@ -1,24 +1,213 @@
-from dataclasses import dataclass
-from typing import Callable, Any
+from __future__ import annotations
+
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Any, NamedTuple, Sequence, TYPE_CHECKING
 
 import synth.ast as ast
 
+if TYPE_CHECKING:
+    from synth.batch import SoABatch
+
+
+VAR = -1
+"""
+Opcode pushing the value of the variable named by the payload.
+"""
+CONST = -2
+"""
+Opcode pushing the payload itself.
+"""
+
+Bytecode = tuple[tuple[int, int, Any], ...]
+"""
+A program in postorder, as a sequence of (opcode, arity, payload) instructions.
+
+Opcodes other than `VAR` and `CONST` index into the evaluators operator table, their payload is the node
+passed to the operator.
+"""
+
+
+class Failure(NamedTuple):
+    """
+    Marks a program whose evaluation raised `error`, see `ASTEvaluator.eval_soa`.
+    """
+    error: Exception
+
+
+def stack_binds(binds: Sequence[dict[str, Any]]) -> dict[str, tuple[Any, ...]]:
+    """
+    Turns a list of bindings into one binding per variable, holding a tuple of its values (one lane per binding).
+
+    All bindings must bind the same variables.
+    """
+    if not binds:
+        return {}
+    return {name: tuple(b[name] for b in binds) for name in binds[0]}
+
 
-@dataclass
+@dataclass(slots=True)
 class ASTEvaluator:
     evals: dict[str, Callable[[ast.Node, tuple[Any, ...]], Any]]
 
+    _ops: list[Callable[[ast.Node, tuple[Any, ...]], Any]] = field(init=False, repr=False, compare=False)
+    _opcodes: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._ops = list(self.evals.values())
+        self._opcodes = {name: i for i, name in enumerate(self.evals)}
+
     def eval(self, node: ast.Node | ast.Value, binds: dict[str, Any]) -> ast.Value:
-        match node:
-            case ast.Var(name):
-                return binds[name]
-            case ast.Int(val):
-                return val
-            case ast.String(val):
-                return val
-            case ast.Value() as val:
-                return val
-            case ast.Node(name, children):
-                return self.evals[name](node, tuple(
-                    self.eval(child, binds) for child in children
-                ))
+        return self.compile(node)(binds)
+
+    def compile(self, node: ast.Node | ast.Value) -> Callable[[dict[str, Any]], Any]:
+        """
+        Compile `node` into a closure that evaluates it for the given bindings, without dispatching on node types
+        or looking up operators.
+
+        The closure is cached on the node, so shared subtrees are only compiled once. It only refers to its node
+        weakly, so it must not be called after the node is gone.
+        """
+        fn = _COMPILE.get(type(node)) or _resolve(_COMPILE, type(node))
+        return fn(self, node)
+
+    def assemble(self, node: ast.Node | ast.Value) -> Bytecode:
+        """
+        Flatten `node` into bytecode for this evaluators operator table.
+
+        The bytecode is not cached. Storing the program of every subtree on its node would take quadratic memory
+        in the size of the tree, and would tie the node to itself through the payload of its last instruction.
+        """
+        code = []
+        _assemble_into(self, node, code)
+        return tuple(code)
+
+    def eval_batch(self, node: ast.Node | ast.Value, binds: dict[str, tuple[Any, ...]], lanes: int) -> tuple[Any, ...]:
+        """
+        Evaluate `node` on `lanes` bindings at once, see `stack_binds`.
+
+        Runs the nodes bytecode on a stack machine, where each stack entry holds the values of all lanes, so every
+        instruction is dispatched on only once instead of once per binding.
+        """
+        ops = self._ops
+        stack = []
+        for opcode, arity, payload in self.assemble(node):
+            if opcode == VAR:
+                stack.append(binds[payload])
+            elif opcode == CONST:
+                stack.append((payload,) * lanes)
+            elif arity == 0:
+                stack.append((ops[opcode](payload, ()),) * lanes)
+            else:
+                op = ops[opcode]
+                args = stack[-arity:]
+                del stack[-arity:]
+                stack.append(tuple(op(payload, lane) for lane in zip(*args)))
+        return stack[0]
+
+    def eval_soa(self, batch: SoABatch, binds: dict[str, Any]) -> list[Any]:
+        """
+        Evaluate all programs of `batch` for the given bindings, see `batch.candidates_to_soa`.
+
+        Each row of the batch is evaluated once, bottom up. Programs whose evaluation raised an exception produce a
+        `Failure` instead of failing the whole batch.
+        """
+        assert batch.evaluator is self, "batch was flattened for a different evaluator"
+        ops = self._ops
+        values = []
+        for opcode, payload, args in zip(batch.opcodes, batch.payloads, batch.args):
+            if opcode == CONST:
+                values.append(payload)
+                continue
+            if opcode == VAR:
+                try:
+                    values.append(binds[payload])
+                except KeyError as ex:
+                    values.append(Failure(ex))
+                continue
+            xs = tuple(values[arg] for arg in args)
+            for x in xs:
+                # failures propagate up to all programs containing them
+                if type(x) is Failure:
+                    values.append(x)
+                    break
+            else:
+                try:
+                    values.append(ops[opcode](payload, xs))
+                except Exception as ex:
+                    values.append(Failure(ex))
+        return [values[root] for root in batch.roots]
+
+
+def _compile_var(evaluator: ASTEvaluator, node: ast.Var):
+    return lambda b, n=node.name: b[n]
+
+
+def _compile_const(evaluator: ASTEvaluator, node: ast.Int | ast.String):
+    return lambda b, v=node.val: v
+
+
+def _compile_value(evaluator: ASTEvaluator, node: ast.Value):
+    return lambda b, v=node: v
+
+
+def _compile_node(evaluator: ASTEvaluator, node: ast.Node):
+    if node._compiled is not None and node._compiled[0] is evaluator:
+        return node._compiled[1]
+    op = evaluator.evals[node.name]
+    cs = tuple(evaluator.compile(child) for child in node.children)
+    # a strong reference would make the node and its cached closure a cycle, keeping it in the interning pool
+    fn = lambda b, op=op, cs=cs, n=weakref.proxy(node): op(n, tuple(c(b) for c in cs))
+    object.__setattr__(node, '_compiled', (evaluator, fn))
+    return fn
+
+
+def _assemble_into(evaluator: ASTEvaluator, node: ast.Node | ast.Value, code: list[tuple[int, int, Any]]):
+    fn = _ASSEMBLE.get(type(node)) or _resolve(_ASSEMBLE, type(node))
+    fn(evaluator, node, code)
+
+
+def _assemble_var(evaluator: ASTEvaluator, node: ast.Var, code: list[tuple[int, int, Any]]):
+    code.append((VAR, 0, node.name))
+
+
+def _assemble_const(evaluator: ASTEvaluator, node: ast.Int | ast.String, code: list[tuple[int, int, Any]]):
+    code.append((CONST, 0, node.val))
+
+
+def _assemble_value(evaluator: ASTEvaluator, node: ast.Value, code: list[tuple[int, int, Any]]):
+    code.append((CONST, 0, node))
+
+
+def _assemble_node(evaluator: ASTEvaluator, node: ast.Node, code: list[tuple[int, int, Any]]):
+    for child in node.children:
+        _assemble_into(evaluator, child, code)
+    code.append((evaluator._opcodes[node.name], len(node.children), node))
+
+
+# dispatch tables of `compile` and `assemble`, keyed by the exact type of the node
+_COMPILE: dict[type, Callable[[ASTEvaluator, Any], Callable[[dict[str, Any]], Any]]] = {
+    ast.Var: _compile_var,
+    ast.Int: _compile_const,
+    ast.String: _compile_const,
+    ast.Value: _compile_value,
+    ast.Node: _compile_node,
+}
+_ASSEMBLE: dict[type, Callable[[ASTEvaluator, Any, list[tuple[int, int, Any]]], None]] = {
+    ast.Var: _assemble_var,
+    ast.Int: _assemble_const,
+    ast.String: _assemble_const,
+    ast.Value: _assemble_value,
+    ast.Node: _assemble_node,
+}
+
+
+def _resolve(table: dict[type, Callable], cls: type) -> Callable:
+    """
+    Look up the entry of the closest base class of `cls` in a dispatch table, and register it for `cls` itself.
+    """
+    for base in cls.__mro__:
+        if base in table:
+            fn = table[cls] = table[base]
+            return fn
+    raise ValueError(f"Can't evaluate {cls.__name__}")
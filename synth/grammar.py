@@ -1,25 +1,78 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from weakref import WeakValueDictionary
 
 import synth.ast as ast
 from synth.symbols import Nonterminal
-from synth.constraints import GenerationConstraint
+from synth.constraints import GenerationConstraint, all_valid
 
 
-@dataclass(frozen=True, unsafe_hash=True)
+_INTERN: WeakValueDictionary = WeakValueDictionary()
+"""
+All live production rules, keyed by their fields.
+"""
+
+
+@dataclass(frozen=True, init=False, eq=False, slots=True, weakref_slot=True)
 class ProductionRule:
+    """
+    Production rules are interned like `Nonterminal`s, and compared by identity. Constraints must therefore be
+    hashable.
+    """
     lhs: Nonterminal
     rhs: ast.Value | ast.Node | Nonterminal
 
-    constraints: tuple[GenerationConstraint, ...] = field(default=())
+    constraints: tuple[GenerationConstraint, ...]
+
+    _hash: int = field(repr=False)
+    _str: str = field(repr=False)
+
+    def __new__(
+        cls,
+        lhs: Nonterminal,
+        rhs: ast.Value | ast.Node | Nonterminal,
+        constraints: tuple[GenerationConstraint, ...] = (),
+    ):
+        key = (lhs, rhs, tuple(constraints))
+        rule = _INTERN.get(key)
+        if rule is None:
+            rule = _INTERN[key] = object.__new__(cls)
+        return rule
+
+    def __init__(
+        self,
+        lhs: Nonterminal,
+        rhs: ast.Value | ast.Node | Nonterminal,
+        constraints: tuple[GenerationConstraint, ...] = (),
+    ):
+        # interned rules are handed out again by `__new__`, see `Nonterminal.__init__`
+        try:
+            self._hash
+            return
+        except AttributeError:
+            pass
+        constraints = tuple(constraints)
+        object.__setattr__(self, 'lhs', lhs)
+        object.__setattr__(self, 'rhs', rhs)
+        object.__setattr__(self, 'constraints', constraints)
+        object.__setattr__(self, '_hash', hash((lhs, rhs, constraints)))
+        if not constraints:
+            s = f"{lhs} \t:= {rhs}"
+        else:
+            s = f"{lhs} \t:= {rhs}: {', '.join(str(c) for c in constraints)}"
+        object.__setattr__(self, '_str', s)
+
+    def __reduce__(self):
+        return ProductionRule, (self.lhs, self.rhs, self.constraints)
+
+    def __hash__(self):
+        return self._hash
 
     def __str__(self):
-        constraint_str = ', '.join(str(c) for c in self.constraints)
-        constr = "" if not self.constraints else f": {constraint_str}"
-        return f"{self.lhs} \t:= {self.rhs}{constr}"
+        return self._str
 
     def can_substitute(self, node: ast.Node | ast.Value):
-        return all(c.is_valid_entry(node) for c in self.constraints)
+        return all_valid(self.constraints, node)
 
 
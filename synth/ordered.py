@@ -1,41 +1,55 @@
 from abc import ABC, abstractmethod
+from functools import total_ordering
 
 
+@total_ordering
 class Ordered(ABC):
     """
     Implementes order on any object that can provide a "key" to be ordered by.
+
+    Objects are only expected to be compared with other `Ordered` objects.
     """
+    __slots__ = ()
 
     @abstractmethod
     def key(self):
         raise NotImplementedError()
 
     def __lt__(self, other):
-        if isinstance(other, Ordered):
-            return self.key() < other.key()
-        raise NotImplementedError()
+        return self.key() < other.key()
 
-    def __gt__(self, other):
-        if isinstance(other, Ordered):
-            return self.key() > other.key()
-        raise NotImplementedError()
+    def __eq__(self, other):
+        return self is other or (isinstance(other, Ordered) and self.key() == other.key())
 
-    def __le__(self, other):
-        if isinstance(other, Ordered):
-            return self.key() <= other.key()
-        raise NotImplementedError()
 
-    def __ge__(self, other):
-        if isinstance(other, Ordered):
-            return self.key() >= other.key()
-        raise NotImplementedError()
+class DataclassOrder(Ordered):
+    """
+    Orders dataclasses by their fields.
 
-    def __eq__(self, other):
-        return isinstance(other, Ordered) and self.key() == other.key()
+    The key is computed once after construction, so subclasses must not be mutated afterwards, and must be
+    declared with `@dataclass(eq=False)` to keep the key based `__eq__` and `__hash__`. The hash of the key is
+    cached on first use.
+    """
+    __slots__ = ('_key', '_hash')
 
+    def __post_init__(self):
+        object.__setattr__(self, '_key', tuple(
+            getattr(self, attr) for attr in self.__dataclass_fields__
+        ))
 
-class DataclassOrder(Ordered):
     def key(self):
-        return tuple(
-            getattr(self, attr) for attr in self.__dataclass_fields__
-        )
+        return self._key
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, DataclassOrder):
+            return self._key == other._key
+        return isinstance(other, Ordered) and self._key == other.key()
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            object.__setattr__(self, '_hash', hash(self._key))
+            return self._hash
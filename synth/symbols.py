@@ -1,20 +1,73 @@
+from __future__ import annotations
+
 from dataclasses import dataclass, field
+import sys
 from abc import ABC
-from typing import Any
+from typing import Any, Iterable
+from weakref import WeakValueDictionary
+
+
+_INTERN: WeakValueDictionary = WeakValueDictionary()
+"""
+All live nonterminals, keyed by their name and constraints.
+"""
 
 
-@dataclass(frozen=True, slots=True, eq=True, order=True)
+@dataclass(frozen=True, slots=True, init=False, eq=False, weakref_slot=True)
 class Nonterminal:
+    """
+    Nonterminals are interned, so that equal nonterminals are the same object and are compared and hashed by
+    identity. Constraints must therefore be hashable.
+
+    Constraints are a set, so the order in which they are added does not matter.
+    """
     name: str
-    constraints: tuple[Any, ...] = field(default=())
+    constraints: frozenset[Any]
+
+    base: Nonterminal = field(repr=False)
+    """
+    The unconstrained nonterminal of the same name.
+    """
+    # the constraints in a fixed order, for `accepts` and `__str__`
+    _checks: tuple[Any, ...] = field(repr=False)
+
+    def __new__(cls, name: str, constraints: Iterable[Any] = frozenset()):
+        key = (name, frozenset(constraints))
+        sym = _INTERN.get(key)
+        if sym is None:
+            sym = _INTERN[key] = object.__new__(cls)
+        return sym
+
+    def __init__(self, name: str, constraints: Iterable[Any] = frozenset()):
+        # `__new__` hands out interned nonterminals again, which must not be re-initialized while others hold them
+        try:
+            self.base
+            return
+        except AttributeError:
+            pass
+        constraints = frozenset(constraints)
+        object.__setattr__(self, 'name', sys.intern(name))
+        object.__setattr__(self, 'constraints', constraints)
+        object.__setattr__(self, '_checks', tuple(sorted(constraints, key=str)))
+        object.__setattr__(self, 'base', Nonterminal(name) if constraints else self)
+
+    def __reduce__(self):
+        # go through the constructor, so that unpickled nonterminals are interned again
+        return Nonterminal, (self.name, self.constraints)
+
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
 
     def __str__(self):
         if not self.constraints:
             return self.name
-        return f"{self.name}: {', '.join(map(str, self.constraints))}"
+        return f"{self.name}: {', '.join(map(str, self._checks))}"
 
     def __add__(self, other: Any):
-        return Nonterminal(self.name, (*self.constraints, other))
+        return Nonterminal(self.name, self.constraints | {other})
 
     def accepts(self, node: Any):
-        return all(c.is_valid_entry(node) for c in self.constraints)
+        for c in self._checks:
+            if not c.is_valid_entry(node):
+                return False
+        return True
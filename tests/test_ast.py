@@ -0,0 +1,16 @@
+from synth import ast
+
+
+def test_intern():
+    x = ast.Var.intern('x')
+    one = ast.Int.intern(1)
+
+    assert ast.Var.intern('x') is x
+    assert ast.Node.intern('sub', (x, one)) is ast.Node.intern('sub', (x, one))
+    assert ast.Node.intern('sub', (x, one)) is not ast.Node.intern('sub', (one, x))
+    assert ast.SymmetricNode.intern('add', (x, one)) is ast.SymmetricNode.intern('add', (one, x))
+
+
+def test_slots():
+    for obj in (ast.Int(1), ast.Var('x'), ast.Node('f', ()), ast.SymmetricNode('add', (ast.Int(1), ast.Int(2)))):
+        assert not hasattr(obj, '__dict__')
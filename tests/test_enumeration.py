@@ -55,3 +55,205 @@ def test_subst_nested_constr():
     g += ProductionRule(A, Node('add', (P + nonzero, P)))
 
     assert tuple(g.perform_substitution(A, depth=2)) == (Node('add', (ast.Int(1), ast.Int(0))),Node('add', (ast.Int(1), ast.Int(1))))
+
+
+def test_equivalence_screen():
+    eval = ASTEvaluator({'add': lambda _, x: x[0] + x[1]})
+    screen = EquivalenceScreen([({'x': 1}, None), ({'x': 2}, None)], eval)
+
+    x = ast.Var('x')
+    screen.register_program(x)
+
+    assert not screen.is_useful_program(Node('add', (x, ast.Int(0))))
+    assert screen.is_useful_program(Node('add', (x, x)))
+
+    # programs failing to evaluate are screened, not raised
+    bad = Node('add', (x, ast.String('a')))
+    assert screen.is_useful_program(bad)
+    screen.register_program(bad)
+    assert not screen.is_useful_program(Node('neg', (x,)))
+    assert not screen.is_useful_program(ast.Var('y'))
+
+
+def test_fold_constants():
+    eval = ASTEvaluator({'add': lambda _, x: x[0] + x[1]})
+
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    g = Grammar(A, eval)
+    g += ProductionRule(P, ast.Int(1))
+    g += ProductionRule(P, ast.Var('x'))
+    g += ProductionRule(A, Node('add', (P, P)))
+    g.finalize()
+
+    assert tuple(g.perform_substitution(A, depth=2)) == (
+        ast.Int(2),
+        Node('add', (ast.Int(1), ast.Var('x'))),
+        Node('add', (ast.Var('x'), ast.Int(1))),
+        Node('add', (ast.Var('x'), ast.Var('x'))),
+    )
+
+
+def test_programs_of_size():
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    g = Grammar(A)
+    g += ProductionRule(P, ast.Int(1))
+    g += ProductionRule(A, P)
+    g += ProductionRule(A, Node('neg', (A,)))
+    g += ProductionRule(A, Node('add', (A, A)))
+
+    one = ast.Int(1)
+    assert g.programs_of_size(A, 1) == [one]
+    assert g.programs_of_size(A, 2) == [Node('neg', (one,))]
+    assert g.programs_of_size(A, 3) == [Node('neg', (Node('neg', (one,)),)), Node('add', (one, one))]
+
+
+def test_dynamic_fills():
+    from synth.constraints import Dynamic
+    P = Nonterminal('P')
+    x, one = ast.Var('x'), ast.Int(1)
+
+    fills = set(Dynamic().fills(Node('add', (P, P)), [[x, one], [x, one]]))
+    assert fills == {(x, x), (x, one), (one, x)}
+    assert len(set(Dynamic().fills(Node('add', (x, P)), [[x, one]]))) == 2
+
+
+def test_compiled_builder():
+    P = Nonterminal('P')
+    x, one = ast.Var.intern('x'), ast.Int.intern(1)
+
+    spec = ExpansionSpec.lower(ProductionRule(P, ast.Node.intern('f', (P, one, P))))
+    assert spec.build(x, x) is ast.Node.intern('f', (x, one, x))
+
+    spec = ExpansionSpec.lower(ProductionRule(P, ast.SymmetricNode('add', (P, P))))
+    assert spec.build(x, one) is spec.build(one, x)
+
+    spec = ExpansionSpec.lower(ProductionRule(P, ast.Node('nil', ())))
+    assert spec.build() is ast.Node.intern('nil', ())
+
+    spec = ExpansionSpec.lower(ProductionRule(P, ast.Node('neg', (P,))))
+    assert spec.build(x) is ast.Node.intern('neg', (x,))
+
+
+def test_prune_constants():
+    eval = ASTEvaluator({})
+    not_one = DoesNotEvaluateTo(1, eval, {})
+
+    P = Nonterminal('P')
+    g = Grammar(P)
+    g += ProductionRule(P, ast.Int(1), (not_one,))
+    g += ProductionRule(P, ast.Int(2))
+    g += ProductionRule(P, ast.Int(3))
+
+    assert tuple(g.perform_substitution(P, depth=1)) == (ast.Int(2), ast.Int(3))
+    assert g.programs_of_size(P, 1) == [ast.Int(2), ast.Int(3)]
+    assert tuple(g.perform_substitution(P + DoesNotEvaluateTo(2, eval, {}), depth=1)) == (ast.Int(3),)
+
+
+def test_no_duplicate_derivations():
+    eval = ASTEvaluator({'add': lambda _, x: x[0] + x[1]})
+
+    P = Nonterminal('P')
+    g = Grammar(P, eval)
+    g += ProductionRule(P, ast.Int.intern(0))
+    g += ProductionRule(P, ast.Int.intern(1))
+    g += ProductionRule(P, Node('add', (P, P)))
+
+    # add(0, 1) and add(1, 0) both fold to 1
+    assert g.programs_of_size(P, 3) == [ast.Int(0), ast.Int(1), ast.Int(2)]
+    assert tuple(g.perform_substitution(P, depth=2)) == (ast.Int(0), ast.Int(1), ast.Int(2))
+
+
+def test_min_depth():
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    B = Nonterminal('B')
+    g = Grammar(A)
+    g += ProductionRule(P, ast.Int(1))
+    g += ProductionRule(A, Node('add', (P, B)))
+    g += ProductionRule(B, Node('neg', (A,)))
+    g += ProductionRule(B, Node('neg', (P,)))
+
+    assert tuple(g.perform_substitution(P, depth=1)) == (ast.Int(1),)
+    assert tuple(g.perform_substitution(B, depth=1)) == ()
+    assert tuple(g.perform_substitution(B, depth=2)) == (Node('neg', (ast.Int(1),)),)
+    assert tuple(g.perform_substitution(A, depth=2)) == ()
+    assert tuple(g.perform_substitution(A, depth=3)) == (Node('add', (ast.Int(1), Node('neg', (ast.Int(1),)))),)
+
+
+def test_parallel_substitution():
+    P = Nonterminal('P')
+    rules = [
+        ProductionRule(P, ast.Int.intern(1)),
+        ProductionRule(P, ast.Var.intern('x')),
+        ProductionRule(P, Node('add', (P, P))),
+        ProductionRule(P, Node('neg', (P,))),
+    ]
+    g, serial = Grammar(P), Grammar(P)
+    for rule in rules:
+        g += rule
+        serial += rule
+
+    parallel = tuple(g.perform_substitution_parallel(P, depth=3, max_workers=2))
+    assert parallel == tuple(serial.perform_substitution(P, depth=3))
+    # results are interned again after coming back from the workers
+    assert all(a is b for a, b in zip(parallel, serial.perform_substitution(P, depth=3)))
+
+
+def test_constraint_set():
+    eval = ASTEvaluator({})
+    nonzero, notone = DoesNotEvaluateTo(0, eval, {}), DoesNotEvaluateTo(1, eval, {})
+
+    A = Nonterminal('A')
+    assert A + nonzero + notone is A + notone + nonzero
+    assert A + nonzero + nonzero is A + nonzero
+    assert str(A + notone + nonzero) == 'A: ≠0, ≠1'
+    # constructing an interned nonterminal again does not reinitialize it
+    assert Nonterminal('A', (nonzero,)) is A + nonzero
+    assert (A + nonzero).base is A
+
+
+def test_constrained_hole_unknown_operator():
+    e = ASTEvaluator({})
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    g = Grammar(A)
+    g += ProductionRule(P, ast.Int(1))
+    g += ProductionRule(P, Node('neg', (P,)))
+    g += ProductionRule(A, Node('f', (P + DoesNotEvaluateTo(0, e, {}),)))
+
+    # programs that can't be evaluated can't be ruled out
+    expected = [Node('f', (ast.Int(1),)), Node('f', (Node('neg', (ast.Int(1),)),))]
+    assert list(g.perform_substitution(A, depth=3)) == expected
+    assert g.programs_of_size(A, 3) == expected[1:]
+
+
+def test_fold_constants_failures():
+    eval = ASTEvaluator({'add': lambda _, x: x[0] + x[1]})
+
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    g = Grammar(A, eval)
+    g += ProductionRule(P, ast.Int.intern(1))
+    g += ProductionRule(P, ast.String.intern('a'))
+    g += ProductionRule(A, Node('neg', (P,)))
+    g += ProductionRule(A, Node('add', (P, P)))
+
+    # unknown operators and operators raising are left unfolded
+    assert [str(p) for p in g.perform_substitution(A, depth=2)] == [
+        'neg(1)', "neg('a')", '2', "add(1, 'a')", "add('a', 1)", "add('a', 'a')",
+    ]
+
+
+def test_distinct_children():
+    P = Nonterminal('P')
+    A = Nonterminal('A')
+    g = Grammar(A)
+    g += ProductionRule(P, ast.Int.intern(1))
+    g += ProductionRule(P, ast.Int.intern(2))
+    # the constant of the template is not interned
+    g += ProductionRule(A, Node('sub', (P, ast.Int(1))), (DistinctChildren(),))
+
+    assert tuple(g.perform_substitution(A, depth=2)) == (Node('sub', (ast.Int(2), ast.Int(1))),)
+    assert not DistinctChildren().is_valid_entry(Node('sub', (ast.Var('x'), ast.Var('x'))))
@@ -0,0 +1,63 @@
+import gc
+import weakref
+
+from synth import ast
+from synth.batch import candidates_to_soa
+from synth.eval import ASTEvaluator, Failure, stack_binds
+
+
+def test_eval_batch():
+    eval = ASTEvaluator({
+        'add': lambda _, x: x[0] + x[1],
+        'sub': lambda _, x: x[0] - x[1],
+    })
+    x, y = ast.Var('x'), ast.Var('y')
+    prog = ast.Node('sub', (ast.Node('add', (x, ast.Int(1))), y))
+    binds = [{'x': 1, 'y': 2}, {'x': 5, 'y': 3}]
+
+    assert eval.eval_batch(prog, stack_binds(binds), 2) == tuple(eval.eval(prog, b) for b in binds) == (0, 3)
+
+
+def test_eval_soa():
+    eval = ASTEvaluator({
+        'add': lambda _, x: x[0] + x[1],
+        'div': lambda _, x: x[0] // x[1],
+    })
+    x = ast.Var('x')
+    shared = ast.Node('add', (x, ast.Int(1)))
+    progs = [shared, ast.Node('add', (shared, shared)), ast.Node('div', (shared, ast.Int(0))), ast.Var('y')]
+
+    batch = candidates_to_soa(progs, eval)
+    # x, 1, add(x, 1), add(...), 0, div(...), y
+    assert len(batch.opcodes) == 7
+
+    res = eval.eval_soa(batch, {'x': 2})
+    assert res[:2] == [3, 6]
+    assert isinstance(res[2], Failure) and isinstance(res[2].error, ZeroDivisionError)
+    assert isinstance(res[3], Failure) and isinstance(res[3].error, KeyError)
+
+
+def test_eval_soa_unknown_operator():
+    eval = ASTEvaluator({'add': lambda _, x: x[0] + x[1]})
+    one = ast.Int(1)
+    progs = [ast.Node('add', (one, one)), ast.Node('add', (ast.Node('neg', (one,)), one))]
+
+    res = eval.eval_soa(candidates_to_soa(progs, eval), {})
+    assert res[0] == 2
+    assert isinstance(res[1], Failure) and isinstance(res[1].error, KeyError)
+
+
+def test_evaluated_nodes_are_freed():
+    eval = ASTEvaluator({'add': lambda n, x: x[0] + x[1]})
+    prog = ast.Node.intern('add', (ast.Var.intern('x'), ast.Int.intern(1)))
+    assert eval.eval(prog, {'x': 1}) == 2
+    assert eval.eval_batch(prog, stack_binds([{'x': 1}]), 1) == (2,)
+
+    # the caches on the node must not keep it alive, so that it leaves the interning pool by refcounting alone
+    ref = weakref.ref(prog)
+    gc.disable()
+    try:
+        del prog
+        assert ref() is None
+    finally:
+        gc.enable()